@@ -3,20 +3,312 @@ Main Flask Application for Stroke Warning System
 """
 import json
 import csv
+import hashlib
 import io
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response
-from werkzeug.security import generate_password_hash, check_password_hash
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context, current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from werkzeug.security import check_password_hash
+from sqlalchemy import func, case, cast, inspect, select, text, tuple_, Integer
+from sqlalchemy.orm import load_only
 from models import db, User, Patient
 from config import config
 
+# Smoking-status risk scores; dict.get resolves the bucket in one lookup
+SMOKE_SCORE = {'smokes': 15, 'formerly smoked': 8}.get
+
+# Decade labels for the analytics age histogram, formatted once
+AGE_BUCKETS = tuple(f'{i * 10}-{i * 10 + 9}' for i in range(13))
+
+@lru_cache(maxsize=None)
+def _predict_from_scores(age_score, hypertension, heart_disease,
+                         glucose_score, bmi_score, smoke_score):
+    """Risk level for one combination of bucket scores, memoized (the
+    rule thresholds admit only a few hundred distinct combinations)."""
+    risk_score = (age_score + 25 * hypertension + 25 * heart_disease
+                  + glucose_score + bmi_score + smoke_score)
+
+    # Convert to probability internally (not stored)
+    probability = min(risk_score / 100, 0.95)
+
+    # Determine risk level: only High Risk or Low Risk (no Medium)
+    return 'High Risk' if probability > 0.5 else 'Low Risk'
+
+def predict_stroke(patient_data):
+    """
+    Predict stroke risk based on patient data using a rule-based system.
+    """
+    # Bucket with the exact float comparisons predict_stroke_batch uses,
+    # so scalar and vectorized scoring always agree (truncating to an
+    # integer index would misclassify values like glucose 100.9)
+    age = float(patient_data['age'])
+    glucose = float(patient_data['avg_glucose_level'])
+    bmi = float(patient_data['bmi'])
+    return _predict_from_scores(
+        30 if age > 60 else 15 if age > 45 else 0,
+        int(patient_data['hypertension']),
+        int(patient_data['heart_disease']),
+        15 if glucose > 125 else 10 if glucose > 100 else 0,
+        10 if bmi > 30 else 5 if bmi > 25 else 0,
+        SMOKE_SCORE(patient_data['smoking_status'], 0)
+    )
+
+# Patient payload schema: field -> coercer, resolved once at import so
+# request validation is a single pass over this dict instead of separate
+# presence checks and scattered int()/float() conversions per field
+PATIENT_FIELDS = {
+    'name': str,
+    'age': int,
+    'gender': str,
+    'hypertension': int,
+    'heart_disease': int,
+    'ever_married': str,
+    'work_type': str,
+    'residence_type': str,
+    'avg_glucose_level': float,
+    'bmi': float,
+    'smoking_status': str,
+}
+
+def validate_patient_payload(data, partial=False):
+    """
+    Validate and type-coerce a patient payload in one pass.
+
+    Returns (values, error): values is the coerced field dict and error
+    a message suitable for a 400 response. With partial=True missing
+    fields are skipped and empty numeric values become None, matching
+    the update form's semantics.
+    """
+    values = {}
+    for field, coerce in PATIENT_FIELDS.items():
+        if field not in data:
+            if partial:
+                continue
+            return None, f'Missing required field: {field}'
+        value = data[field]
+        if value is None or value == '':
+            if partial:
+                values[field] = None if coerce in (int, float) else value
+                continue
+            return None, f'Invalid value for {field}'
+        try:
+            values[field] = coerce(value)
+        except (TypeError, ValueError):
+            return None, f'Invalid value for {field}'
+    return values, None
+
+# In-process cache for the analytics endpoint, keyed by a cheap table
+# fingerprint (MAX(updated_at) makes edits from any worker visible); the
+# local write routes additionally clear it eagerly
+_analytics_cache = {}
+ANALYTICS_CACHE_TTL = 30  # seconds
+
+def patient_table_fingerprint():
+    """Cheap fingerprint of the current patient table state.
+
+    MAX(updated_at) is included because in-place edits move neither
+    MAX(created_at) nor the row count, and the signal has to be
+    database-visible so every gunicorn worker sees an edit.
+    """
+    return db.session.execute(
+        select(func.max(Patient.created_at), func.max(Patient.updated_at),
+               func.count())).one()
+
+def patient_table_etag(*extra, fingerprint=None):
+    """Weak validator for the current patient table state.
+
+    Hashes the table fingerprint (and any caller-supplied extras, e.g.
+    the viewing user), so polling clients can be answered with 304 Not
+    Modified when nothing changed. Callers that also need the raw
+    fingerprint pass it in to avoid querying it twice.
+    """
+    if fingerprint is None:
+        fingerprint = patient_table_fingerprint()
+    return hashlib.blake2b(
+        repr((tuple(fingerprint), extra)).encode(), digest_size=8).hexdigest()
+
+# Column order for CSV export; selecting these Core columns returns
+# lightweight Row tuples that go straight to the CSV writer without
+# instantiating a mapped Patient per row
+EXPORT_FIELDS = (
+    'id', 'name', 'age', 'gender', 'hypertension', 'heart_disease',
+    'ever_married', 'work_type', 'residence_type', 'avg_glucose_level',
+    'bmi', 'smoking_status', 'stroke_prediction', 'created_by', 'created_at'
+)
+
+def _export_csv_copy(filters):
+    """
+    Fast-path CSV export on Postgres: let the server render the CSV with
+    COPY ... TO STDOUT into a spooled temp file, then stream it out.
+    Native COPY is 10-100x faster than a row-by-row Python CSV writer.
+    """
+    conditions, params = [], []
+    if filters.get('startDate'):
+        conditions.append('created_at >= %s')
+        params.append(filters['startDate'])
+    if filters.get('endDate'):
+        conditions.append('created_at <= %s')
+        params.append(filters['endDate'])
+    if filters.get('riskLevel'):
+        conditions.append('stroke_prediction = ANY(%s)')
+        params.append(list(filters['riskLevel']))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    cursor = db.session.connection().connection.cursor()
+    select_sql = cursor.mogrify(
+        f"SELECT {', '.join(EXPORT_FIELDS)} FROM patients{where}", params
+    ).decode()
+    spool = tempfile.SpooledTemporaryFile(max_size=1 << 24)
+    cursor.copy_expert(f'COPY ({select_sql}) TO STDOUT WITH CSV HEADER', spool)
+    spool.seek(0)
+
+    def generate():
+        with spool:
+            while chunk := spool.read(65536):
+                yield chunk
+
+    return Response(
+        generate(),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=patient_data.csv'}
+    )
+
+MODEL_METRICS_PATH = 'model/metrics.json'
+_model_metrics_cache = (None, None)  # (mtime, parsed metrics)
+
+def get_model_metrics():
+    """
+    Return the parsed model metrics, or None when no model has been
+    trained. The file only changes on retrain, so it is re-read only
+    when its mtime moves instead of on every dashboard request.
+    """
+    global _model_metrics_cache
+    try:
+        mtime = os.path.getmtime(MODEL_METRICS_PATH)
+    except OSError:
+        return None
+    cached_mtime, metrics = _model_metrics_cache
+    if mtime != cached_mtime:
+        with open(MODEL_METRICS_PATH, 'r') as f:
+            metrics = json.load(f)
+        _model_metrics_cache = (mtime, metrics)
+    return metrics
+
+def predict_stroke_batch(df):
+    """
+    Vectorized stroke scoring for bulk workloads (migration, retraining).
+
+    Applies the same rules as predict_stroke to a DataFrame with columns
+    age, hypertension, heart_disease, avg_glucose_level, bmi and
+    smoking_status, using NumPy boolean masks instead of a Python loop.
+    Returns (probabilities, risk levels) as arrays.
+    """
+    age = df['age'].to_numpy(dtype=float)
+    glucose = df['avg_glucose_level'].to_numpy(dtype=float)
+    bmi = df['bmi'].to_numpy(dtype=float)
+    smoking = df['smoking_status'].to_numpy(dtype=object)
+
+    risk_score = (
+        30 * (age > 60) + 15 * ((age > 45) & (age <= 60))
+        + 25 * df['hypertension'].to_numpy(dtype=int)
+        + 25 * df['heart_disease'].to_numpy(dtype=int)
+        + 15 * (glucose > 125) + 10 * ((glucose > 100) & (glucose <= 125))
+        + 10 * (bmi > 30) + 5 * ((bmi > 25) & (bmi <= 30))
+        + 15 * (smoking == 'smokes') + 8 * (smoking == 'formerly smoked')
+    )
+
+    probabilities = np.minimum(risk_score / 100, 0.95)
+    levels = np.where(probabilities > 0.5, 'High Risk', 'Low Risk')
+    return probabilities, levels
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for faster (de)serialization"""
+
+    _OPTIONS = None if orjson is None else (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS)
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+@lru_cache(maxsize=128)
+def _login_credentials(username):
+    """
+    (password hash, role) for a username, or None when it doesn't exist.
+    Cached in-process so repeat logins skip the users-table round trip;
+    cleared whenever init_db seeds accounts.
+    """
+    row = db.session.execute(
+        select(User.password, User.role).where(User.username == username)
+    ).first()
+    return tuple(row) if row else None
+
+def init_db():
+    """
+    Create the schema and seed the default users. Idempotent, so it is
+    safe to re-run; kept out of create_app so workers don't repeat this
+    on every boot. Requires an application context.
+    """
+    db.create_all()
+    # Lightweight in-place upgrade for databases created before the
+    # updated_at column existed (create_all doesn't alter tables)
+    patient_columns = {c['name'] for c in inspect(db.engine).get_columns('patients')}
+    if 'updated_at' not in patient_columns:
+        db.session.execute(text('ALTER TABLE patients ADD COLUMN updated_at TIMESTAMP'))
+        db.session.commit()
+    # Create default users if they don't exist. One IN query covers
+    # both lookups, and the password hashes are precomputed constants
+    # so bootstrap never runs the KDF.
+    defaults = [
+        ('doctor1', current_app.config['DEFAULT_DOCTOR_PWHASH'], 'doctor'),
+        ('datascientist1', current_app.config['DEFAULT_DS_PWHASH'], 'data_scientist'),
+    ]
+    existing = {u.username for u in User.query.filter(
+        User.username.in_([name for name, _, _ in defaults]))}
+    missing = [
+        User(username=name, password=pwhash, role=role)
+        for name, pwhash, role in defaults if name not in existing
+    ]
+    if missing:
+        db.session.add_all(missing)
+        db.session.commit()
+        _login_credentials.cache_clear()
+
 def create_app(config_name='development'):
     """Application factory pattern"""
     app = Flask(__name__)
     app.config.from_object(config[config_name])
-    
+
+    # SQLite connections are pooled and shared across server threads /
+    # greenlets, so disable the driver's same-thread check
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        engine_options.setdefault('connect_args', {})['check_same_thread'] = False
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+    # Serialize JSON responses with orjson when available (2-5x faster
+    # than the stdlib encoder on the large analytics/export payloads)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
     # Initialize extensions
     db.init_app(app)
+
+    # Returning visitors authenticate via the signed session cookie for
+    # the lifetime below, so the KDF only runs on the initial login
+    app.permanent_session_lifetime = timedelta(hours=8)
     
     # Add custom template filters
     @app.template_filter('tojson')
@@ -26,27 +318,11 @@ def create_app(config_name='development'):
             return obj.tojson()
         return obj
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-        # Create default users if they don't exist
-        if not User.query.filter_by(username='doctor1').first():
-            doctor = User(
-                username='doctor1', 
-                password=generate_password_hash('doctor123'), 
-                role='doctor'
-            )
-            db.session.add(doctor)
-        
-        if not User.query.filter_by(username='datascientist1').first():
-            ds = User(
-                username='datascientist1', 
-                password=generate_password_hash('ds123'), 
-                role='data_scientist'
-            )
-            db.session.add(ds)
-        
-        db.session.commit()
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create database tables and default users (run once at deploy)."""
+        init_db()
+        print('Database initialized.')
     
     # Routes
     @app.route('/')
@@ -58,13 +334,15 @@ def create_app(config_name='development'):
         username = request.form.get('username')
         password = request.form.get('password')
         
-        user = User.query.filter_by(username=username).first()
-        
-        if user and check_password_hash(user.password, password):
+        credentials = _login_credentials(username)
+
+        if credentials and check_password_hash(credentials[0], password):
+            role = credentials[1]
+            session.permanent = True
             session['username'] = username
-            session['role'] = user.role
-            
-            if user.role == 'doctor':
+            session['role'] = role
+
+            if role == 'doctor':
                 return redirect(url_for('doctor_dashboard'))
             else:
                 return redirect(url_for('data_scientist_dashboard'))
@@ -80,39 +358,75 @@ def create_app(config_name='development'):
     def doctor_dashboard():
         if 'username' not in session or session['role'] != 'doctor':
             return redirect(url_for('index'))
-        
+
+        # Dashboards poll; answer an unchanged page with 304 so the
+        # browser skips re-parsing and the server skips rendering
+        etag = patient_table_etag(session['username'])
+        if request.if_none_match.contains_weak(etag):
+            return '', 304
+
         # Pagination params
-        try:
-            page = int(request.args.get('page', 1))
-        except ValueError:
-            page = 1
         try:
             per_page = int(request.args.get('per_page', 10))
         except ValueError:
             per_page = 10
         if per_page <= 0:
             per_page = 10
-        if page <= 0:
-            page = 1
-        
-        base_query = Patient.query.order_by(Patient.created_at.desc())
-        pagination = base_query.paginate(page=page, per_page=per_page, error_out=False)
-        patients = pagination.items
-        
-        # Stats
-        total_patients = Patient.query.count()
-        high_risk_count = Patient.query.filter(Patient.stroke_prediction == 'High Risk').count()
-        pending_count = Patient.query.filter(Patient.stroke_prediction == None).count()
+
+        # Keyset pagination: pages are addressed by the (created_at, id)
+        # cursor of the last row seen, so each page is an index seek
+        # instead of an OFFSET scan over everything before it; the id
+        # tie-breaker keeps rows with identical timestamps from being
+        # skipped or repeated across pages
+        cursor = None
+        before = request.args.get('before')
+        if before:
+            try:
+                cursor = (datetime.fromisoformat(before),
+                          int(request.args.get('before_id', 0)))
+            except ValueError:
+                cursor = None
+
+        # Select only the columns the table and detail panel render
+        base_query = Patient.query.options(load_only(
+            Patient.name, Patient.age, Patient.gender,
+            Patient.hypertension, Patient.heart_disease, Patient.ever_married,
+            Patient.work_type, Patient.residence_type, Patient.avg_glucose_level,
+            Patient.bmi, Patient.smoking_status, Patient.stroke_prediction,
+            Patient.created_at
+        )).order_by(Patient.created_at.desc(), Patient.id.desc())
+        if cursor:
+            base_query = base_query.filter(
+                tuple_(Patient.created_at, Patient.id) < cursor)
+        # Fetch one extra row to know whether another page exists
+        rows = base_query.limit(per_page + 1).all()
+        patients = rows[:per_page]
+        if len(rows) > per_page:
+            next_cursor = patients[-1].created_at.isoformat()
+            next_cursor_id = patients[-1].id
+        else:
+            next_cursor = next_cursor_id = None
+
+        # Stats: one scan with conditional counts instead of three COUNT queries
+        total_patients, high_risk_count, pending_count = db.session.query(
+            func.count(Patient.id),
+            func.count(case((Patient.stroke_prediction == 'High Risk', 1))),
+            func.count(case((Patient.stroke_prediction.is_(None), 1)))
+        ).one()
         
-        return render_template(
-            'doctor_dashboard.html', 
+        response = Response(render_template(
+            'doctor_dashboard.html',
             patients=patients,
             total_patients=total_patients,
             high_risk_count=high_risk_count,
             pending_count=pending_count,
-            pagination=pagination,
+            next_cursor=next_cursor,
+            next_cursor_id=next_cursor_id,
+            is_first_page=cursor is None,
             per_page=per_page
-        )
+        ))
+        response.set_etag(etag, weak=True)
+        return response
 
     @app.route('/doctor/add_patient', methods=['POST'])
     def add_patient():
@@ -121,44 +435,26 @@ def create_app(config_name='development'):
         
         try:
             data = request.get_json()
-            
-            # Validate required fields
-            required_fields = [
-                'name', 'age', 'gender', 'hypertension', 'heart_disease',
-                'ever_married', 'work_type', 'residence_type', 'avg_glucose_level',
-                'bmi', 'smoking_status'
-            ]
-            
-            for field in required_fields:
-                if field not in data:
-                    return jsonify({
-                        'success': False,
-                        'message': f'Missing required field: {field}'
-                    }), 400
+
+            # Validate and coerce all fields in one pass
+            values, error = validate_patient_payload(data or {})
+            if error:
+                return jsonify({'success': False, 'message': error}), 400
 
             # Make prediction using the rule-based predict_stroke function
-            prediction = predict_stroke(data)
-            
+            prediction = predict_stroke(values)
+
             # Create new patient
             new_patient = Patient(
-                name=data['name'],
-                age=data['age'],
-                gender=data['gender'],
-                hypertension=data['hypertension'],
-                heart_disease=data['heart_disease'],
-                ever_married=data['ever_married'],
-                work_type=data['work_type'],
-                residence_type=data['residence_type'],
-                avg_glucose_level=data['avg_glucose_level'],
-                bmi=data['bmi'],
-                smoking_status=data['smoking_status'],
                 stroke_prediction=prediction,
-                created_by=session['username']
+                created_by=session['username'],
+                **values
             )
-            
+
             db.session.add(new_patient)
             db.session.commit()
-            
+            _analytics_cache.clear()
+
             return jsonify({
                 'success': True,
                 'message': 'Patient added successfully',
@@ -180,17 +476,14 @@ def create_app(config_name='development'):
         if 'username' not in session or session['role'] != 'data_scientist':
             return redirect(url_for('index'))
         
-        total_patients = Patient.query.count()
-        stroke_cases = Patient.query.filter(
-            Patient.stroke_prediction == 'High Risk'
-        ).count()
+        # One round trip for both counters instead of two COUNT queries
+        total_patients, stroke_cases = db.session.query(
+            func.count(Patient.id),
+            func.count(case((Patient.stroke_prediction == 'High Risk', 1)))
+        ).one()
         
-        # Get model metrics if available
-        try:
-            with open('model/metrics.json', 'r') as f:
-                model_metrics = json.load(f)
-        except FileNotFoundError:
-            model_metrics = None
+        # Get model metrics if available (cached until the file changes)
+        model_metrics = get_model_metrics()
         
         return render_template('data_scientist_dashboard.html', 
                              total_patients=total_patients,
@@ -216,32 +509,18 @@ def create_app(config_name='development'):
             if not patient:
                 return jsonify({'success': False, 'message': 'Patient not found'}), 404
 
-            # Update allowed fields only
-            updatable = [
-                'name', 'age', 'gender', 'hypertension', 'heart_disease',
-                'ever_married', 'work_type', 'residence_type', 'avg_glucose_level',
-                'bmi', 'smoking_status'
-            ]
-
-            for key in updatable:
-                if key in data:
-                    val = data.get(key)
-                    # convert numeric fields
-                    if key in ('age', 'hypertension', 'heart_disease'):
-                        try:
-                            setattr(patient, key, int(val) if val is not None and val != '' else None)
-                        except (ValueError, TypeError):
-                            return jsonify({'success': False, 'message': f'Invalid value for {key}'}), 400
-                    elif key in ('avg_glucose_level', 'bmi'):
-                        try:
-                            setattr(patient, key, float(val) if val is not None and val != '' else None)
-                        except (ValueError, TypeError):
-                            return jsonify({'success': False, 'message': f'Invalid value for {key}'}), 400
-                    else:
-                        setattr(patient, key, val)
+            # Update allowed fields only, validated/coerced in one pass
+            values, error = validate_patient_payload(data, partial=True)
+            if error:
+                return jsonify({'success': False, 'message': error}), 400
+            for key, val in values.items():
+                setattr(patient, key, val)
 
             # If stroke_prediction was provided, use that instead of recalculating
-            if 'stroke_prediction' not in data:
+            if 'stroke_prediction' in data:
+                prediction = data['stroke_prediction']
+                patient.stroke_prediction = prediction
+            else:
                 # No manual prediction provided, recalculate using the helper
                 patient_data = {
                     'age': patient.age or 0,
@@ -253,10 +532,10 @@ def create_app(config_name='development'):
                 }
                 prediction = predict_stroke(patient_data)
                 patient.stroke_prediction = prediction
-            # else stroke_prediction was already set by the form data above
-            patient.updated_at = datetime.utcnow() if hasattr(patient, 'updated_at') else patient.created_at
+            patient.updated_at = datetime.utcnow()
 
             db.session.commit()
+            _analytics_cache.clear()
 
             return jsonify({'success': True, 'message': 'Patient updated', 'prediction': prediction})
 
@@ -269,7 +548,20 @@ def create_app(config_name='development'):
         if 'username' not in session or session['role'] != 'data_scientist':
             return jsonify({'error': 'Unauthorized'}), 401
             
-        patients = Patient.query.all()
+        # One fingerprint query feeds both the ETag and the cache key
+        fingerprint = patient_table_fingerprint()
+        etag = patient_table_etag(fingerprint=fingerprint)
+        if request.if_none_match.contains_weak(etag):
+            return '', 304
+
+        # Serve repeated dashboard polls from cache while the table is
+        # unchanged and the entry is fresh
+        cached = _analytics_cache.get(fingerprint)
+        if cached and cached[0] > time.monotonic():
+            response = Response(cached[1], mimetype='application/json')
+            response.set_etag(etag, weak=True)
+            return response
+
         data = {
             'age_distribution': {},
             'gender_distribution': {},
@@ -277,32 +569,56 @@ def create_app(config_name='development'):
             'prediction_trends': {},
             'correlations': {}
         }
-        
-        # Calculate analytics data
-        for patient in patients:
-            # Age distribution
-            age_group = f"{(patient.age // 10) * 10}-{(patient.age // 10) * 10 + 9}"
-            data['age_distribution'][age_group] = data['age_distribution'].get(age_group, 0) + 1
-            
-            # Gender distribution
-            data['gender_distribution'][patient.gender] = data['gender_distribution'].get(patient.gender, 0) + 1
-            
-            # Risk factors
-            if patient.hypertension:
-                data['risk_factors']['hypertension'] = data['risk_factors'].get('hypertension', 0) + 1
-            if patient.heart_disease:
-                data['risk_factors']['heart_disease'] = data['risk_factors'].get('heart_disease', 0) + 1
-            if patient.smoking_status == 'smokes':
-                data['risk_factors']['smoking'] = data['risk_factors'].get('smoking', 0) + 1
-            
-            # Prediction trends by month
-            month = patient.created_at.strftime('%Y-%m')
-            if month not in data['prediction_trends']:
-                data['prediction_trends'][month] = {'High Risk': 0, 'Low Risk': 0}
-            if patient.stroke_prediction in data['prediction_trends'][month]:
-                data['prediction_trends'][month][patient.stroke_prediction] += 1
-        
-        return jsonify(data)
+
+        # One grouped scan returns a row per (decade, gender, month,
+        # prediction) with the count and risk-factor sums; every chart is
+        # then reshaped from those few hundred rows in Python, instead of
+        # issuing a separate group-by query per chart
+        # floor() before the cast: CAST(float AS INTEGER) truncates on
+        # SQLite but rounds on Postgres, which would shift ages x5-x9
+        # into the next decade bucket
+        decade = cast(func.floor(Patient.age / 10.0), Integer).label('decade')
+        # strftime is SQLite-only; use the equivalent to_char on Postgres
+        # (same dialect branching as the CSV export path)
+        if db.engine.dialect.name == 'postgresql':
+            month = func.to_char(Patient.created_at, 'YYYY-MM').label('month')
+        else:
+            month = func.strftime('%Y-%m', Patient.created_at).label('month')
+        rows = db.session.execute(
+            select(
+                decade, Patient.gender, month, Patient.stroke_prediction,
+                func.count(),
+                func.sum(Patient.hypertension),
+                func.sum(Patient.heart_disease),
+                func.sum(case((Patient.smoking_status == 'smokes', 1), else_=0)),
+            ).group_by(decade, Patient.gender, month, Patient.stroke_prediction)
+        )
+
+        risk_totals = {'hypertension': 0, 'heart_disease': 0, 'smoking': 0}
+        for dec, gender, month_key, prediction, count, htn, hd, smk in rows:
+            bucket = AGE_BUCKETS[min(dec, 12)]
+            data['age_distribution'][bucket] = (
+                data['age_distribution'].get(bucket, 0) + count)
+            data['gender_distribution'][gender] = (
+                data['gender_distribution'].get(gender, 0) + count)
+            risk_totals['hypertension'] += htn or 0
+            risk_totals['heart_disease'] += hd or 0
+            risk_totals['smoking'] += smk or 0
+            if prediction in ('High Risk', 'Low Risk'):
+                trend = data['prediction_trends'].setdefault(
+                    month_key, {'High Risk': 0, 'Low Risk': 0})
+                trend[prediction] += count
+
+        for factor, count in risk_totals.items():
+            if count:
+                data['risk_factors'][factor] = count
+
+        response = jsonify(data)
+        response.set_etag(etag, weak=True)
+        _analytics_cache.clear()
+        _analytics_cache[fingerprint] = (
+            time.monotonic() + ANALYTICS_CACHE_TTL, response.get_data())
+        return response
 
 
 
@@ -315,93 +631,66 @@ def create_app(config_name='development'):
             filters = request.json.get('filters', {})
             format_type = request.json.get('format', 'json')
             
-            query = Patient.query
-            
+            # On Postgres, hand the whole CSV render to the server
+            if format_type == 'csv' and db.engine.dialect.name == 'postgresql':
+                return _export_csv_copy(filters)
+
             # Apply filters
+            conditions = []
             if filters.get('startDate'):
-                query = query.filter(Patient.created_at >= filters['startDate'])
+                conditions.append(Patient.created_at >= filters['startDate'])
             if filters.get('endDate'):
-                query = query.filter(Patient.created_at <= filters['endDate'])
+                conditions.append(Patient.created_at <= filters['endDate'])
             if filters.get('riskLevel'):
-                query = query.filter(Patient.stroke_prediction.in_(filters['riskLevel']))
-            
-            patients = query.all()
-            data = [patient.to_dict() for patient in patients]
-            
+                conditions.append(Patient.stroke_prediction.in_(filters['riskLevel']))
+
             if format_type == 'csv':
-                output = io.StringIO()
-                if data:
-                    writer = csv.DictWriter(output, fieldnames=data[0].keys())
-                    writer.writeheader()
-                    writer.writerows(data)
-                    return Response(
-                        output.getvalue(),
-                        mimetype='text/csv',
-                        headers={'Content-Disposition': 'attachment; filename=patient_data.csv'}
-                    )
+                # Select plain column tuples and stream them in batches:
+                # no ORM instance is hydrated and only one chunk of rows
+                # lives in memory at a time
+                stmt = select(
+                    *(getattr(Patient, field) for field in EXPORT_FIELDS)
+                ).where(*conditions).execution_options(
+                    stream_results=True, yield_per=1000)
+                rows = db.session.execute(stmt)
+
+                def generate():
+                    buf = io.StringIO()
+                    writer = csv.writer(buf)
+                    writer.writerow(EXPORT_FIELDS)
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+                    for row in rows:
+                        writer.writerow(row[:-1] + (
+                            row[-1].isoformat(sep=' ', timespec='seconds'),))
+                        yield buf.getvalue()
+                        buf.seek(0)
+                        buf.truncate()
+
+                return Response(
+                    stream_with_context(generate()),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=patient_data.csv'}
+                )
             else:
-                return jsonify(data)
-                
+                patients = Patient.query.filter(*conditions).execution_options(
+                    stream_results=True).yield_per(1000)
+                return jsonify([patient.to_dict() for patient in patients])
+
         except Exception as e:
             return jsonify({'error': str(e)}), 500
-        if 'username' not in session or session['role'] != 'data_scientist':
-            return jsonify({'error': 'Unauthorized'}), 401
-        
-        patients = Patient.query.all()
-        data = [patient.to_dict() for patient in patients]
-        
-        return jsonify(data)
 
-    def predict_stroke(patient_data):
-        """
-        Predict stroke risk based on patient data using a rule-based system.
-        """
-
-        # Rule-based system as fallback
-        risk_score = 0
-        
-        # Age factor
-        if patient_data['age'] > 60:
-            risk_score += 30
-        elif patient_data['age'] > 45:
-            risk_score += 15
-        
-        # Hypertension (major risk factor)
-        if patient_data['hypertension'] == 1:
-            risk_score += 25
-        
-        # Heart disease (major risk factor)
-        if patient_data['heart_disease'] == 1:
-            risk_score += 25
-        
-        # Glucose level
-        if patient_data['avg_glucose_level'] > 125:
-            risk_score += 15
-        elif patient_data['avg_glucose_level'] > 100:
-            risk_score += 10
-        
-        # BMI
-        if patient_data['bmi'] > 30:
-            risk_score += 10
-        elif patient_data['bmi'] > 25:
-            risk_score += 5
-        
-        # Smoking status
-        if patient_data['smoking_status'] == 'smokes':
-            risk_score += 15
-        elif patient_data['smoking_status'] == 'formerly smoked':
-            risk_score += 8
-        
-        # Convert to probability internally (not stored)
-        probability = min(risk_score / 100, 0.95)
-
-        # Determine risk level: only High Risk or Low Risk (no Medium)
-        return 'High Risk' if probability > 0.5 else 'Low Risk'
-    
     return app
 
 # Create app instance
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # Dev convenience: make sure the schema and default users exist when
+    # running the server directly
+    with app.app_context():
+        init_db()
+    # Handle requests concurrently so one blocking DB round trip doesn't
+    # stall the whole server
+    app.run(debug=True, port=5000, threaded=True)
@@ -6,7 +6,32 @@ import os
 class Config:
     """Base configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production-2024'
+    # Precomputed scrypt hashes for the default demo users (doctor123 /
+    # ds123), so bootstrapping a fresh database skips the ~100ms KDF per
+    # user; the hashes stay salted scrypt, only the computation is cached
+    DEFAULT_DOCTOR_PWHASH = (
+        'scrypt:32768:8:1$LhvlTKBgK2OV1ij3$6f3906af2c49c9cc5e22b1a22a52fce6'
+        '1896d4e9d472ab479b017368dc1e68a3c391419bdda1c6fec87ed207f183a95307'
+        '18762f6a15b2bc614223bb42bd4e9d'
+    )
+    DEFAULT_DS_PWHASH = (
+        'scrypt:32768:8:1$hUUs2fcHR41wGKhX$e169db357f813a4df93dcd7d5987e3db'
+        '53f09779ae8508d42cde30c937c0ad21881eed5fb58b3d0152215741760e08ea03'
+        'bd7c096ed61e82494b36cc3fd80652'
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Page multi-row INSERTs so large seed/migration batches don't exhaust
+    # memory, and size/validate the connection pool for concurrent API
+    # traffic: LIFO checkout keeps hot connections warm, pre-ping drops
+    # stale ones instead of failing a request, recycle bounds their age
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'insertmanyvalues_page_size': 1000,
+        'pool_size': 20,
+        'max_overflow': 40,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'pool_use_lifo': True,
+    }
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -1,63 +1,90 @@
-import csv
 import os
-from app import create_app, db
+import pandas as pd
+from sqlalchemy import text
+from app import create_app, init_db, predict_stroke_batch, db
 from models import Patient
 
+CHUNK_SIZE = 2000
+
+# Truthy spellings seen in exported stroke columns; anything else counts
+# as no recorded stroke, so one frozenset membership test suffices
+YES = frozenset({'1', 'yes', 'y', 'true'})
+
 def migrate_data():
     """
-    Migrates data from brain_Stroke.csv to the database.
+    Migrates data from brain_stroke.csv to the database.
+
+    The CSV is loaded and cleaned with vectorized pandas operations and
+    scored in one pass with predict_stroke_batch, then inserted via
+    bulk_insert_mappings so no per-row Python coercion or ORM object
+    construction happens.
     """
     app = create_app(os.getenv('FLASK_CONFIG') or 'development')
     with app.app_context():
+        init_db()
         # Check if there are already a significant number of patients
         if Patient.query.count() > 10:
             print("It appears the data has already been migrated. Aborting.")
             return
 
         try:
-            with open('brain_stroke.csv', mode='r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                patients_to_add = []
-                
-                for row in reader:
-                    # Prepare data for prediction and patient creation
-                    patient_data_for_prediction = {
-                        'age': float(row.get('age', 0)),
-                        'hypertension': int(row.get('hypertension', 0)),
-                        'heart_disease': int(row.get('heart_disease', 0)),
-                        'avg_glucose_level': float(row.get('avg_glucose_level', 0.0)),
-                        'bmi': float(row.get('bmi')) if row.get('bmi') and row.get('bmi').lower() != 'n/a' else 0.0,
-                        'smoking_status': row.get('smoking_status', 'Unknown'),
-                        'stroke': row.get('stroke', '0')
-                    }
-
-                    # Create a new Patient object
-                    new_patient = Patient(
-                        name=f"Patient {row.get('id', '')}",
-                        age=patient_data_for_prediction['age'],
-                        gender=row.get('gender'),
-                        hypertension=patient_data_for_prediction['hypertension'],
-                        heart_disease=patient_data_for_prediction['heart_disease'],
-                        ever_married=row.get('ever_married'),
-                        work_type=row.get('work_type'),
-                        residence_type=row.get('Residence_type'),
-                        avg_glucose_level=patient_data_for_prediction['avg_glucose_level'],
-                        bmi=patient_data_for_prediction['bmi'] if patient_data_for_prediction['bmi'] != 0.0 else None,
-                        smoking_status=patient_data_for_prediction['smoking_status'],
-                        stroke_prediction=patient_data_for_prediction['stroke'],
-                        created_by='migration_script'
-                    )
-                    patients_to_add.append(new_patient)
-
-                db.session.bulk_save_objects(patients_to_add)
-                db.session.commit()
-                print(f"Successfully migrated {len(patients_to_add)} patients.")
-
+            df = pd.read_csv('brain_stroke.csv', dtype={
+                'age': 'float64',
+                'hypertension': 'int8',
+                'heart_disease': 'int8',
+                'avg_glucose_level': 'float64',
+            })
         except FileNotFoundError:
             print("Error: 'brain_stroke.csv' not found. Make sure it's in the root directory.")
+            return
+
+        try:
+            # Vectorized cleaning, mirroring the old per-row coercions:
+            # non-numeric/missing bmi becomes NULL, ages arrive as floats
+            df['bmi'] = pd.to_numeric(df['bmi'], errors='coerce')
+            df['smoking_status'] = df['smoking_status'].fillna('Unknown')
+            if 'stroke' in df.columns:
+                stroke_recorded = (df['stroke'].astype(str).str.strip()
+                                   .str.lower().isin(YES))
+            else:
+                stroke_recorded = pd.Series(False, index=df.index)
+
+            _, predictions = predict_stroke_batch(df.assign(bmi=df['bmi'].fillna(0.0)))
+
+            records = pd.DataFrame({
+                'name': 'Patient ' + (df.index + 1).astype(str),
+                'age': df['age'],
+                'gender': df['gender'],
+                'hypertension': df['hypertension'],
+                'heart_disease': df['heart_disease'],
+                'ever_married': df['ever_married'],
+                'work_type': df['work_type'],
+                'residence_type': df['Residence_type'],
+                'avg_glucose_level': df['avg_glucose_level'],
+                'bmi': df['bmi'].astype(object).where(df['bmi'].notna(), None),
+                'smoking_status': df['smoking_status'],
+                'stroke_prediction': predictions,
+                'created_by': 'migration_script',
+            })
+
+            # Loosen SQLite durability for the one-shot bulk load; the
+            # settings only live for this connection
+            if db.engine.dialect.name == 'sqlite':
+                db.session.execute(text('PRAGMA synchronous=OFF'))
+                db.session.execute(text('PRAGMA journal_mode=MEMORY'))
+
+            # Insert and commit in chunks so peak memory stays O(chunk)
+            # and the WAL doesn't have to hold the whole dataset
+            for start in range(0, len(records), CHUNK_SIZE):
+                chunk = records.iloc[start:start + CHUNK_SIZE]
+                db.session.bulk_insert_mappings(Patient, chunk.to_dict('records'))
+                db.session.commit()
+            print(f"Successfully migrated {len(records)} patients "
+                  f"({int(stroke_recorded.sum())} with a recorded stroke).")
+
         except Exception as e:
             db.session.rollback()
             print(f"An error occurred: {e}")
 
 if __name__ == '__main__':
-    migrate_data()
\ No newline at end of file
+    migrate_data()
@@ -1,11 +1,29 @@
 """
 Database Models for Stroke Warning System
 """
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import DATETIME as SQLITE_DATETIME
 from datetime import datetime
 
 db = SQLAlchemy()
 
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """Put SQLite connections in WAL mode so readers don't block the writer"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.close()
+
+# SQLite's CURRENT_TIMESTAMP stores second-precision text, while bound
+# datetime parameters default to microsecond precision; storing at second
+# precision keeps cursor/range comparisons against server-stamped rows exact
+SERVER_STAMPED_DATETIME = db.DateTime().with_variant(
+    SQLITE_DATETIME(truncate_microseconds=True), 'sqlite')
+
 class User(db.Model):
     """User model for authentication"""
     __tablename__ = 'users'
@@ -38,7 +56,23 @@ class Patient(db.Model):
     stroke_prediction = db.Column(db.String(50))  # High Risk or Low Risk
     validated = db.Column(db.Boolean, default=False)
     created_by = db.Column(db.String(80), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Stamped by the database (UTC) so bulk inserts don't need a Python
+    # clock read per row
+    created_at = db.Column(SERVER_STAMPED_DATETIME, server_default=db.func.now())
+    # Bumped on edits; MAX(updated_at) feeds the dashboard ETags and the
+    # training-array cache key, which otherwise can't see in-place edits.
+    # Unlike created_at this never meets a server-stamped comparison, so
+    # it keeps microsecond precision and same-second edits stay distinct
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+
+    # Dashboard ordering and export range filters hit created_at; the risk
+    # counts and export risk filter hit stroke_prediction (+ date range);
+    # the ETag/cache fingerprints take MAX(updated_at) on every poll
+    __table_args__ = (
+        db.Index('ix_patient_created_at', created_at.desc(), id.desc()),
+        db.Index('ix_patient_prediction_created', stroke_prediction, created_at),
+        db.Index('ix_patient_updated_at', updated_at),
+    )
 
     def __repr__(self):
         return f'<Patient {self.name} (ID: {self.id})>'
@@ -59,8 +93,10 @@ class Patient(db.Model):
             'bmi': self.bmi,
             'smoking_status': self.smoking_status,
             'stroke_prediction': self.stroke_prediction,
-            
-            'created_at': self.created_at.isoformat()
+
+            # Keep the 'T' separator: this string feeds new Date(...) in
+            # the dashboard JS, which only reliably parses ISO 8601
+            'created_at': self.created_at.isoformat(timespec='seconds')
         }
 
     def to_dict(self):
@@ -81,5 +117,7 @@ class Patient(db.Model):
             'stroke_prediction': self.stroke_prediction,
             
             'created_by': self.created_by,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            # isoformat skips format-string parsing; same output as
+            # strftime('%Y-%m-%d %H:%M:%S') but ~2-3x faster per row
+            'created_at': self.created_at.isoformat(sep=' ', timespec='seconds')
         }
\ No newline at end of file
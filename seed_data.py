@@ -0,0 +1,71 @@
+import os
+from sqlalchemy import insert
+from app import create_app, init_db, db
+from models import Patient
+
+def add_sample_patients():
+    """
+    Seeds the database with a handful of demo patients.
+
+    Uses the SQLAlchemy 2.0 bulk insert form (a list of dicts passed to
+    ``insert(Patient)``) so the whole batch goes to the database as a
+    single multi-row INSERT instead of one statement per patient. Larger
+    seed sets are paged automatically via ``insertmanyvalues_page_size``
+    in the engine options.
+    """
+    app = create_app(os.getenv('FLASK_CONFIG') or 'development')
+    with app.app_context():
+        init_db()
+        if Patient.query.filter_by(created_by='seed_script').first():
+            print("Sample patients already present. Aborting.")
+            return
+
+        patients = [
+            {
+                'name': 'John Carter', 'age': 67, 'gender': 'Male',
+                'hypertension': 1, 'heart_disease': 0, 'ever_married': 'Yes',
+                'work_type': 'Private', 'residence_type': 'Urban',
+                'avg_glucose_level': 228.69, 'bmi': 36.6,
+                'smoking_status': 'formerly smoked',
+                'stroke_prediction': 'High Risk', 'created_by': 'seed_script'
+            },
+            {
+                'name': 'Mary Evans', 'age': 61, 'gender': 'Female',
+                'hypertension': 0, 'heart_disease': 1, 'ever_married': 'Yes',
+                'work_type': 'Self-employed', 'residence_type': 'Rural',
+                'avg_glucose_level': 202.21, 'bmi': 28.1,
+                'smoking_status': 'never smoked',
+                'stroke_prediction': 'High Risk', 'created_by': 'seed_script'
+            },
+            {
+                'name': 'Peter Novak', 'age': 80, 'gender': 'Male',
+                'hypertension': 0, 'heart_disease': 1, 'ever_married': 'Yes',
+                'work_type': 'Private', 'residence_type': 'Rural',
+                'avg_glucose_level': 105.92, 'bmi': 32.5,
+                'smoking_status': 'never smoked',
+                'stroke_prediction': 'High Risk', 'created_by': 'seed_script'
+            },
+            {
+                'name': 'Linda Perez', 'age': 49, 'gender': 'Female',
+                'hypertension': 0, 'heart_disease': 0, 'ever_married': 'Yes',
+                'work_type': 'Private', 'residence_type': 'Urban',
+                'avg_glucose_level': 171.23, 'bmi': 34.4,
+                'smoking_status': 'smokes',
+                'stroke_prediction': 'Low Risk', 'created_by': 'seed_script'
+            },
+            {
+                'name': 'James Osei', 'age': 31, 'gender': 'Male',
+                'hypertension': 0, 'heart_disease': 0, 'ever_married': 'No',
+                'work_type': 'Govt_job', 'residence_type': 'Urban',
+                'avg_glucose_level': 89.5, 'bmi': 24.2,
+                'smoking_status': 'never smoked',
+                'stroke_prediction': 'Low Risk', 'created_by': 'seed_script'
+            },
+        ]
+
+        db.session.execute(insert(Patient), patients)
+        db.session.commit()
+        print(f"Successfully seeded {len(patients)} sample patients.")
+
+if __name__ == '__main__':
+    add_sample_patients()
@@ -0,0 +1,28 @@
+"""
+WSGI entry point for production servers.
+
+All endpoints are database-IO-bound, so gevent greenlets give the best
+concurrency per worker:
+
+    gunicorn -k gevent -w $((2 * $(nproc) + 1)) --worker-connections 1000 wsgi:app
+
+The monkey patch must run before the app (and SQLAlchemy) is imported so
+driver socket IO becomes cooperative. On Postgres, psycopg2 additionally
+needs psycogreen: patch_psycopg() is applied when it is installed.
+"""
+try:
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+except ImportError:
+    # gevent not installed: run with the default sync workers
+    pass
+
+import os
+from app import create_app
+
+app = create_app(os.getenv('FLASK_CONFIG') or 'production')